@@ -29,10 +29,87 @@ class Settings(BaseSettings):
     DB_PASSWORD: Optional[str] = None
     DB_DRIVER: str = "postgresql"
     
+    DATABASE_READ_REPLICA_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = None
+    DB_READ_YOUR_WRITES_SECONDS: int = 5
+    
+    LOAN_ARCHIVE_AFTER_DAYS: int = 180
+    LOAN_ARCHIVE_BATCH_SIZE: int = 1000
+    LOAN_ARCHIVE_INTERVAL_SECONDS: int = 3600
+    
+    RECOMMENDATIONS_TOP_K: int = 20
+    RECOMMENDATIONS_BATCH_SIZE: int = 5000
+    RECOMMENDATIONS_INTERVAL_SECONDS: int = 300
+    
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_USER_PER_MINUTE: float = 120
+    RATE_LIMIT_USER_BURST: int = 30
+    RATE_LIMIT_CLIENT_PER_MINUTE: float = 60
+    RATE_LIMIT_CLIENT_BURST: int = 20
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    TRUSTED_PROXIES: str = "127.0.0.1,::1"
+    ADMISSION_MAX_CONCURRENCY: int = 32
+    ADMISSION_QUEUE_SIZE: int = 200
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: int = 30
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    
+    WARMUP_ENABLED: bool = True
+    WARMUP_TOP_BOOKS: int = 200
+    WARMUP_TOP_SEARCHES: int = 50
+    WARMUP_SEARCH_WINDOW_DAYS: int = 7
+    WARMUP_CONCURRENCY: int = 8
+    WARMUP_TIMEOUT_SECONDS: int = 60
+    SEARCH_STATS_FLUSH_SECONDS: int = 60
+    SEARCH_PREFETCH_PER_MINUTE: float = 30
+    SEARCH_PREFETCH_BURST: int = 10
+    
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    PROFILING_SAMPLE_EVERY: int = 0
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_OUTPUT_DIR: str = "profiles"
+    
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0
+    LOG_QUEUE_SIZE: int = 10000
+    
+    CACHE_BACKEND: str = "memory"
+    CACHE_KEY_PREFIX: str = "library"
+    CACHE_MEMORY_MAX_ENTRIES: int = 10000
+    CACHE_SQLITE_PATH: str = "cache/cache.sqlite3"
+    REDIS_URL: Optional[str] = None
+    CACHE_BOOK_TTL_SECONDS: int = 86400
+    CACHE_SEARCH_TTL_SECONDS: int = 600
+    CACHE_TOKEN_TTL_SECONDS: int = 300
+    CACHE_RESPONSE_TTL_SECONDS: int = 600
+    
+    SEARCH_CACHE_CONTROL: str = "public, max-age=30, stale-while-revalidate=120"
+    BOOK_CACHE_CONTROL: str = "public, no-cache"
+    
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_BROTLI_CACHED_QUALITY: int = 9
+    
+    COVER_CACHE_DIR: str = "cache/covers"
+    COVER_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    COVER_WIDTHS: str = "64,128,256,512,800"
+    COVER_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+    COVER_MISSING_TTL_SECONDS: int = 300
+    COVER_FETCH_CONCURRENCY: int = 8
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,22 +1,167 @@
-from sqlalchemy import create_engine
+import asyncio
+import hashlib
+import threading
+from contextvars import ContextVar
+from typing import Optional, Set
+from fastapi import Request
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.metrics import instrument_engine
+from app.services.cache import Cache, create_cache_backend
 
-engine = create_engine(settings.get_database_url())
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+_engine = None
+_read_engine = None
+_engine_lock = threading.Lock()
+
+# Callers who just wrote are pinned to the primary for a short window so
+# that their next reads never hit a replica that has not caught up yet.
+# Pins get their own backend so bulk cache traffic cannot evict them.
+primary_pins = Cache(create_cache_backend(), "primary_pin", settings.DB_READ_YOUR_WRITES_SECONDS)
+_request_pins: ContextVar[Optional[Set[str]]] = ContextVar("request_pins", default=None)
+
+
+def _build_engine(url: str):
+    kwargs = {}
+    if not url.startswith("sqlite"):
+        kwargs.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+        if settings.DB_STATEMENT_TIMEOUT_MS and url.startswith("postgresql"):
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    engine = create_engine(url, **kwargs)
+    instrument_engine(engine)
+    return engine
+
+
+# Engines are built on first use rather than at import so that importing
+# the app never depends on database settings or connectivity.
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = _build_engine(settings.get_database_url())
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+def get_read_engine():
+    global _read_engine
+    if _read_engine is None:
+        primary = get_engine()
+        with _engine_lock:
+            if _read_engine is None:
+                if settings.DATABASE_READ_REPLICA_URL:
+                    engine = _build_engine(settings.DATABASE_READ_REPLICA_URL)
+                else:
+                    engine = primary
+                ReadSessionLocal.configure(bind=engine)
+                _read_engine = engine
+    return _read_engine
+
 
 def create_tables():
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so indexes added to an
+    # existing table later are created here.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except DBAPIError:
+                # Another worker created it between the check and the create.
+                if index.name not in {existing["name"] for existing in inspect(engine).get_indexes(table.name)}:
+                    raise
+
+
+def check_database():
+    with get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+def _pin_key(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _pin_after_commit(session):
+    # Commits can run in worker threads, so the pin is only recorded here
+    # and written by PrimaryPinMiddleware before the response goes out.
+    pin_key = session.info.get("pin_key")
+    pins = _request_pins.get()
+    if pin_key is None or pins is None:
+        return
+    pins.add(pin_key)
 
 
-def get_db():
+async def _write_pins(pins: Set[str]):
+    keys = list(pins)
+    pins.clear()
+    await asyncio.gather(*(primary_pins.set(key, True) for key in keys))
+
+
+class PrimaryPinMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.DATABASE_READ_REPLICA_URL:
+            await self.app(scope, receive, send)
+            return
+
+        pins: Set[str] = set()
+        token = _request_pins.set(pins)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and pins:
+                await _write_pins(pins)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_pins.reset(token)
+            # Commits made after the response started, such as in
+            # background tasks, are still pinned for later requests.
+            if pins:
+                await _write_pins(pins)
+
+
+def get_db(request: Request):
+    get_engine()
     db = SessionLocal()
+    db.info["pin_key"] = _pin_key(request)
     try:
         yield db
     finally:
         db.close()
 
+
+async def get_read_db(request: Request):
+    get_read_engine()
+    pin_key = _pin_key(request)
+    if pin_key is not None and _read_engine is not _engine and await primary_pins.get(pin_key):
+        db = SessionLocal()
+    else:
+        db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
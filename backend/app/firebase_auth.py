@@ -1,35 +1,43 @@
 import firebase_admin
+import hashlib
+import logging
+import time
 from firebase_admin import credentials, auth
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from app.config import settings
+from app.logging_config import set_log_user
+from app.services.cache import token_cache
+from app.timing import span
 import os
 
+logger = logging.getLogger(__name__)
+
+
 def initialize_firebase():
     try:
         if firebase_admin._apps:
-            print("Firebase Admin SDK already initialized")
+            logger.info("Firebase Admin SDK already initialized")
             return
         
         try:
             cred_dict = settings.get_firebase_credentials()
             cred = credentials.Certificate(cred_dict)
             firebase_admin.initialize_app(cred)
-            print("Firebase Admin SDK initialized successfully")
+            logger.info("Firebase Admin SDK initialized successfully")
             
         except ValueError as e:
-            print(f"WARNING: Firebase credentials not properly configured: {e}")
-            print("Authentication will not work. Please configure Firebase credentials.")
-            print("Options:")
-            print("1. Set individual Firebase environment variables (FIREBASE_PROJECT_ID, FIREBASE_PRIVATE_KEY, etc.)")
-            print("2. Provide firebase-credentials.json file")
+            logger.warning(
+                "Firebase credentials not properly configured: %s. Authentication will not work. "
+                "Set the FIREBASE_* environment variables or provide firebase-credentials.json.",
+                e,
+            )
             return
         
     except ValueError as e:
-        print(f"Firebase app already initialized: {e}")
-    except Exception as e:
-        print(f"ERROR: Firebase initialization failed: {e}")
-        print("Authentication will not work until this is fixed.")
+        logger.info("Firebase app already initialized: %s", e)
+    except Exception:
+        logger.exception("Firebase initialization failed; authentication will not work until this is fixed")
 
 
 security = HTTPBearer()
@@ -46,7 +54,14 @@ async def verify_firebase_token(
             )
         
         token = credentials.credentials
-        decoded_token = auth.verify_id_token(token)
+        with span("auth"):
+            cache_key = hashlib.sha256(token.encode()).hexdigest()
+            decoded_token = await token_cache.get(cache_key)
+            if decoded_token is None:
+                decoded_token = auth.verify_id_token(token)
+                ttl = min(settings.CACHE_TOKEN_TTL_SECONDS, int(decoded_token["exp"] - time.time()))
+                if ttl > 0:
+                    await token_cache.set(cache_key, decoded_token, ttl)
         return decoded_token
     except auth.InvalidIdTokenError:
         raise HTTPException(
@@ -61,7 +76,7 @@ async def verify_firebase_token(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Token verification error: {str(e)}")
+        logger.warning("Token verification error: %s", e)
         raise HTTPException(
             status_code=401,
             detail=f"Authentication failed: {str(e)}"
@@ -69,5 +84,7 @@ async def verify_firebase_token(
 
 
 async def get_current_user(token: dict = Security(verify_firebase_token)) -> str:
-    return token.get("uid")
+    uid = token.get("uid")
+    set_log_user(uid)
+    return uid
 
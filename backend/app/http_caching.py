@@ -0,0 +1,62 @@
+import hashlib
+import orjson
+from typing import Any, Optional
+from fastapi import Request, Response
+from app.compression import compress, negotiate_encoding
+from app.config import settings
+from app.services.cache import response_cache
+from app.timing import span
+
+
+def make_etag(*parts: Any) -> str:
+    canonical = orjson.dumps(parts, default=str, option=orjson.OPT_SORT_KEYS)
+    return '"' + hashlib.sha256(canonical).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x".
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    # Strong validators must differ per content-coding, so encoded bodies
+    # carry the encoding as a suffix.
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def render_json(content: Any) -> bytes:
+    return orjson.dumps(content)
+
+
+async def conditional_response(request: Request, content: Any, etag: str, cache_control: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    for candidate in (encoded_etag(etag, encoding), etag):
+        if etag_matches(request, candidate):
+            headers["ETag"] = candidate
+            return Response(status_code=304, headers=headers)
+
+    # The ETag identifies the payload, so its encoded bodies can be cached
+    # and replayed without serializing or compressing again.
+    cache_key = f"{etag}:{encoding or 'identity'}"
+    body = await response_cache.get_bytes(cache_key)
+    if body is None:
+        with span("serialize"):
+            body = render_json(content)
+        if encoding is not None:
+            if len(body) < settings.COMPRESSION_MIN_SIZE:
+                return Response(content=body, media_type="application/json", headers=headers)
+            with span("compress"):
+                body = compress(body, encoding, cached=True)
+        await response_cache.set_bytes(cache_key, body)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        headers["ETag"] = encoded_etag(etag, encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
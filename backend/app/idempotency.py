@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import orjson
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import SessionLocal, get_engine
+from app.models import IdempotencyRecord
+
+POLL_INTERVAL = 0.05
+PURGE_INTERVAL = 300
+
+# Records live in the database rather than the shared cache so that bulk
+# cache traffic can never evict a stored response or an in-flight claim.
+RecordKey = Tuple[str, str, str]
+
+# Requests in this process that currently own a key, so duplicates here are
+# woken as soon as it completes instead of on the next poll.
+_in_flight: Dict[RecordKey, asyncio.Event] = {}
+_next_purge = 0.0
+
+
+def _as_dict(row: IdempotencyRecord) -> dict:
+    return {
+        "state": row.state,
+        "fingerprint": row.fingerprint,
+        "status_code": row.status_code,
+        "body": row.body,
+    }
+
+
+def _where(key: RecordKey):
+    scope, user_id, idempotency_key = key
+    return and_(
+        IdempotencyRecord.scope == scope,
+        IdempotencyRecord.user_id == user_id,
+        IdempotencyRecord.idempotency_key == idempotency_key,
+    )
+
+
+def _load(key: RecordKey) -> Optional[dict]:
+    # Expired records and abandoned claims read as absent, so the caller
+    # goes on to claim the key itself.
+    get_engine()
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        row = db.get(IdempotencyRecord, key)
+        if row is None or row.expires_at < now or (row.state == "pending" and row.locked_until < now):
+            return None
+        return _as_dict(row)
+    finally:
+        db.close()
+
+
+def _claim(key: RecordKey, fingerprint: str) -> Tuple[bool, Optional[dict]]:
+    # Returns (True, None) when this request now owns the key, otherwise
+    # the record it found, which is None if the key changed hands meanwhile.
+    get_engine()
+    now = datetime.utcnow()
+    values = {
+        "fingerprint": fingerprint,
+        "state": "pending",
+        "status_code": None,
+        "body": None,
+        "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+        "expires_at": now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+    }
+    scope, user_id, idempotency_key = key
+    db = SessionLocal()
+    try:
+        db.add(IdempotencyRecord(scope=scope, user_id=user_id, idempotency_key=idempotency_key, **values))
+        try:
+            db.commit()
+            return True, None
+        except IntegrityError:
+            db.rollback()
+        taken = db.execute(
+            update(IdempotencyRecord)
+            .where(_where(key))
+            .where(or_(
+                IdempotencyRecord.expires_at < now,
+                and_(IdempotencyRecord.state == "pending", IdempotencyRecord.locked_until < now),
+            ))
+            .values(**values)
+        ).rowcount
+        db.commit()
+        if taken:
+            return True, None
+        row = db.get(IdempotencyRecord, key)
+        return False, _as_dict(row) if row is not None else None
+    finally:
+        db.close()
+
+
+def _complete(key: RecordKey, status_code: int, body: Any):
+    get_engine()
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(IdempotencyRecord)
+            .where(_where(key))
+            .values(state="done", status_code=status_code, body=body)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _release(key: RecordKey):
+    get_engine()
+    db = SessionLocal()
+    try:
+        db.execute(delete(IdempotencyRecord).where(_where(key)).where(IdempotencyRecord.state == "pending"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _purge_expired():
+    get_engine()
+    db = SessionLocal()
+    try:
+        db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at < datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _fingerprint(payload: BaseModel) -> str:
+    return hashlib.sha256(orjson.dumps(payload.model_dump(), option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def _replay(record: dict, fingerprint: str, response: Response):
+    if record["fingerprint"] != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request body",
+        )
+    response.headers["Idempotent-Replayed"] = "true"
+    if record["status_code"] >= 400:
+        raise HTTPException(status_code=record["status_code"], detail=record["body"], headers={"Idempotent-Replayed": "true"})
+    response.status_code = record["status_code"]
+    return record["body"]
+
+
+async def _purge_if_due():
+    global _next_purge
+    if time.monotonic() >= _next_purge:
+        _next_purge = time.monotonic() + PURGE_INTERVAL
+        await asyncio.to_thread(_purge_expired)
+
+
+async def _wait_for_result(key: RecordKey) -> Optional[dict]:
+    # Another request holds the key; wait until it stores a result or its
+    # claim expires, in which case None is returned and the caller retries.
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        event = _in_flight.get(key)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(POLL_INTERVAL)
+        record = await asyncio.to_thread(_load, key)
+        if record is None or record["state"] != "pending":
+            return record
+    raise HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is still being processed",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def run_idempotent(
+    scope: str,
+    user_id: str,
+    idempotency_key: Optional[str],
+    payload: BaseModel,
+    response: Response,
+    handler: Callable[[], Awaitable[Any]],
+):
+    # The first response for a (user, key) pair, success or client error,
+    # is stored and replayed for retries. Server errors release the key so
+    # the retry runs again.
+    if not idempotency_key:
+        return await handler()
+    if len(idempotency_key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+
+    await _purge_if_due()
+    key = (scope, user_id, idempotency_key)
+    fingerprint = _fingerprint(payload)
+
+    while True:
+        claimed, record = await asyncio.to_thread(_claim, key, fingerprint)
+        if claimed:
+            break
+        if record is not None and record["state"] == "pending":
+            record = await _wait_for_result(key)
+        if record is not None:
+            return _replay(record, fingerprint, response)
+
+    event = _in_flight[key] = asyncio.Event()
+    try:
+        try:
+            result = await handler()
+        except BaseException as e:
+            if isinstance(e, HTTPException) and e.status_code < 500:
+                await asyncio.to_thread(_complete, key, e.status_code, e.detail)
+            else:
+                await asyncio.to_thread(_release, key)
+            raise
+        await asyncio.to_thread(_complete, key, response.status_code or 200, jsonable_encoder(result))
+        return result
+    finally:
+        _in_flight.pop(key, None)
+        event.set()
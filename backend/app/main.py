@@ -1,27 +1,38 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from app.compression import CompressionMiddleware
 from app.config import settings
+from app.database import PrimaryPinMiddleware
 from app.routers import books, loans, wishlist, users, admin
-from app.firebase_auth import initialize_firebase
-from app.database import create_tables
+from app.logging_config import RequestLoggingMiddleware
+from app.metrics import MetricsMiddleware, metrics_response
+from app.profiling import ProfilingMiddleware
+from app.startup import check_readiness, lifespan
+from app.timing import ServerTimingMiddleware
 
 app = FastAPI(
     title="Library API",
     description="Backend API for Library Management System",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
-initialize_firebase()
-
-create_tables()
-
+app.add_middleware(PrimaryPinMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(ServerTimingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(RequestLoggingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(books.router, prefix="/api/books", tags=["Books"])
 app.include_router(loans.router, prefix="/api/loans", tags=["Loans"])
@@ -43,3 +54,17 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+
+@app.get("/ready")
+async def readiness_check():
+    components = await check_readiness()
+    ready = bool(components) and all(status == "ok" for status in components.values())
+    return ORJSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "components": components},
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, Text, Float, JSON
+from sqlalchemy import Column, String, Date, DateTime, Boolean, Integer, ForeignKey, Text, Float, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -28,6 +28,8 @@ class User(Base):
 
 class Loan(Base):
     __tablename__ = "loans"
+    # Serves the archiver's scan for old returned loans.
+    __table_args__ = (Index("ix_loans_status_returned_date", "status", "returned_date"),)
 
     id = Column(String, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id"))
@@ -40,6 +42,19 @@ class Loan(Base):
     user = relationship("User", back_populates="loans")
 
 
+class ArchivedLoan(Base):
+    __tablename__ = "archived_loans"
+
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.id"), index=True)
+    book_id = Column(String, index=True)
+    borrowed_date = Column(DateTime, index=True)
+    due_date = Column(DateTime)
+    returned_date = Column(DateTime, nullable=True)
+    status = Column(String, default="returned")
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
 class WishListItem(Base):
     __tablename__ = "wishlist_items"
 
@@ -52,3 +67,48 @@ class WishListItem(Base):
     user = relationship("User", back_populates="wishlist_items")
 
 
+class BookCooccurrence(Base):
+    __tablename__ = "book_cooccurrences"
+
+    book_id = Column(String, primary_key=True)
+    other_book_id = Column(String, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+
+class BookRecommendation(Base):
+    __tablename__ = "book_recommendations"
+
+    book_id = Column(String, primary_key=True)
+    related = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RecommendationState(Base):
+    __tablename__ = "recommendation_state"
+
+    id = Column(Integer, primary_key=True)
+    last_borrowed_date = Column(DateTime, nullable=True)
+    last_loan_id = Column(String, nullable=True)
+
+
+class SearchStat(Base):
+    __tablename__ = "search_stats"
+
+    search_key = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    params = Column(JSON, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_records"
+
+    scope = Column(String, primary_key=True)
+    user_id = Column(String, primary_key=True)
+    idempotency_key = Column(String(255), primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    state = Column(String, default="pending", nullable=False)
+    status_code = Column(Integer, nullable=True)
+    body = Column(JSON, nullable=True)
+    locked_until = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,85 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from app.config import settings
+
+
+# Samples the stack of one thread and aggregates it in collapsed ("folded")
+# format, which flamegraph.pl and speedscope read directly.
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.samples.items():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _should_profile(self, scope) -> bool:
+        if settings.PROFILING_TOKEN:
+            for name, value in scope.get("headers", []):
+                if name == b"x-profile-token":
+                    return value.decode("latin-1") == settings.PROFILING_TOKEN
+        every = settings.PROFILING_SAMPLE_EVERY
+        return every > 0 and next(self._counter) % every == 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # The profiler samples the whole event loop thread, so only one
+        # request is profiled at a time to keep the output attributable.
+        if not self._lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(
+            threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000
+        )
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self._lock.release()
+            self._save(scope, profiler)
+
+    def _save(self, scope, profiler: SamplingProfiler):
+        os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+        route = scope["path"].strip("/").replace("/", "_") or "root"
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{route}.folded"
+        profiler.write(os.path.join(settings.PROFILING_OUTPUT_DIR, filename))
@@ -0,0 +1,239 @@
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+from fastapi import Depends, HTTPException, Request, Security
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from app.config import settings
+from app.firebase_auth import get_current_user, verify_firebase_token
+from app.logging_config import set_log_user
+from app.metrics import record_admission_rejection
+
+# Lower values are admitted first and shed last.
+CRITICAL = 0
+NORMAL = 1
+LOW = 2
+
+PRIORITY_NAMES = {CRITICAL: "critical", NORMAL: "normal", LOW: "low"}
+
+
+class TokenBuckets:
+    # One bucket per key, refilled lazily on access. Least recently used
+    # keys are dropped past max_keys, which only ever resets them to full.
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def take(self, key: str) -> float:
+        # Returns 0 when a token was taken, otherwise the seconds until one
+        # will be available.
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AdmissionController:
+    # Caps concurrent requests. Queued requests are granted slots in
+    # priority order, and each priority stops queueing at its own depth,
+    # so low-priority traffic is shed first as the queue grows.
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.timeout = timeout
+        self.queue_limits = {CRITICAL: queue_size, NORMAL: queue_size // 2, LOW: queue_size // 4}
+        self.active = 0
+        self.queued = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.queue_limits[priority]:
+            raise Overloaded()
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over as the wait gave up.
+                self.release()
+            else:
+                future.cancel()
+                self.queued -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.queued -= 1
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+user_buckets = TokenBuckets(
+    settings.RATE_LIMIT_USER_PER_MINUTE,
+    settings.RATE_LIMIT_USER_BURST,
+    settings.RATE_LIMIT_MAX_KEYS,
+)
+client_buckets = TokenBuckets(
+    settings.RATE_LIMIT_CLIENT_PER_MINUTE,
+    settings.RATE_LIMIT_CLIENT_BURST,
+    settings.RATE_LIMIT_MAX_KEYS,
+)
+admission = AdmissionController(
+    settings.ADMISSION_MAX_CONCURRENCY,
+    settings.ADMISSION_QUEUE_SIZE,
+    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+
+trusted_proxies = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in settings.TRUSTED_PROXIES.split(",")
+    if entry.strip()
+]
+optional_security = HTTPBearer(auto_error=False)
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_address(request: Request) -> str:
+    # Forwarding headers are only believed when the peer is a trusted proxy.
+    # X-Forwarded-For is walked from the right, skipping our own proxies, so
+    # a client cannot choose its key by prepending entries.
+    host = request.client.host if request.client else "unknown"
+    if not _is_trusted(host):
+        return host
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        for address in reversed([part.strip() for part in forwarded_for.split(",") if part.strip()]):
+            host = address
+            if not _is_trusted(address):
+                break
+        return host
+    return request.headers.get("x-real-ip", host).strip()
+
+
+async def _client_bucket(
+    request: Request, credentials: Optional[HTTPAuthorizationCredentials]
+) -> Tuple[TokenBuckets, str]:
+    # Signed-in callers share a bucket per uid wherever they connect from;
+    # anonymous or unverifiable requests fall back to the client address.
+    if credentials is not None:
+        try:
+            token = await verify_firebase_token(credentials)
+        except HTTPException:
+            token = None
+        if token and token.get("uid"):
+            set_log_user(token["uid"])
+            return user_buckets, f"user:{token['uid']}"
+    return client_buckets, f"ip:{client_address(request)}"
+
+
+def _reject(reason: str, priority: int, retry_after: float):
+    record_admission_rejection(reason, PRIORITY_NAMES[priority])
+    raise HTTPException(
+        status_code=429,
+        detail="Too many requests. Please retry later.",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def check_client_rate(
+    request: Request, credentials: Optional[HTTPAuthorizationCredentials], priority: int = NORMAL
+):
+    # Charges the caller's bucket without taking an admission slot, for
+    # routes that only limit their expensive path.
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    buckets, key = await _client_bucket(request, credentials)
+    wait = buckets.take(key)
+    if wait > 0:
+        _reject("rate_limit", priority, wait)
+
+
+@asynccontextmanager
+async def _admit(buckets: Optional[TokenBuckets], key: Optional[str], priority: int):
+    if not settings.RATE_LIMIT_ENABLED:
+        yield
+        return
+
+    if buckets is not None:
+        wait = buckets.take(key)
+        if wait > 0:
+            _reject("rate_limit", priority, wait)
+
+    try:
+        await admission.acquire(priority)
+    except Overloaded:
+        _reject("overload", priority, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+    try:
+        yield
+    finally:
+        admission.release()
+
+
+def limit_user(priority: int = NORMAL):
+    async def dependency(current_user: str = Depends(get_current_user)):
+        async with _admit(user_buckets, f"user:{current_user}", priority):
+            yield
+
+    return dependency
+
+
+def limit_client(priority: int = NORMAL):
+    async def dependency(
+        request: Request,
+        credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security),
+    ):
+        if not settings.RATE_LIMIT_ENABLED:
+            yield
+            return
+        buckets, key = await _client_bucket(request, credentials)
+        async with _admit(buckets, key, priority):
+            yield
+
+    return dependency
+
+
+def limit_concurrency(priority: int = NORMAL):
+    # Admission only, for routes that are cheap per caller but may fan out
+    # to Google.
+    async def dependency():
+        async with _admit(None, None, priority):
+            yield
+
+    return dependency
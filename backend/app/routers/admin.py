@@ -5,11 +5,13 @@ from typing import List
 from datetime import datetime
 import uuid
 from app.firebase_auth import get_current_user
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import Loan, User, Book
+from app.rate_limit import limit_user
 from app.services.google_books import google_books_service
+from app.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 class AdminLoanResponse(BaseModel):
@@ -28,12 +30,12 @@ class AdminLoanResponse(BaseModel):
 
 
 
-@router.get("/loans", response_model=List[AdminLoanResponse])
+@router.get("/loans", response_model=List[AdminLoanResponse], dependencies=[Depends(limit_user())])
 async def get_all_active_loans(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    read_db: Session = Depends(get_read_db)
 ):
-    loans = db.query(Loan, User).join(
+    loans = read_db.query(Loan, User).join(
         User, Loan.user_id == User.id
     ).filter(
         Loan.status == "active"
@@ -53,9 +55,9 @@ async def get_all_active_loans(
                 borrowed_date=loan.borrowed_date.isoformat(),
                 due_date=loan.due_date.isoformat(),
                 status=loan.status,
-                book_title=book_data.get("title", ""),
-                book_image=book_data.get("coverImage", ""),
-                book_authors=book_data.get("authors", []),
+                book_title=book_data.title,
+                book_image=book_data.coverImage or "",
+                book_authors=book_data.authors,
             ))
         except Exception as e:
             raise HTTPException(
@@ -1,15 +1,30 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+import asyncio
+import httpx
+import os
+from fastapi import APIRouter, Query, HTTPException, Depends, Request, Response, Security
+from fastapi.responses import FileResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import Optional
+from app.config import settings
+from app.services.cache import book_cache, cover_url_cache
+from app.services.covers import cover_cache
 from app.services.google_books import google_books_service
-from app.database import get_db
+from app.services.recommendations import get_related_books
+from app.services.warmup import prefetch_next_page, search_stats
+from app.database import get_db, get_read_db
+from app.http_caching import conditional_response, etag_matches, make_etag
 from app.models import Book
+from app.rate_limit import LOW, check_client_rate, limit_client, limit_concurrency, optional_security
+from app.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
-@router.get("/search")
+@router.get("/search", dependencies=[Depends(limit_client(LOW))])
 async def search_books(
+    request: Request,
     query: Optional[str] = Query(None, description="Search query"),
     author: Optional[str] = Query(None, description="Author name"),
     category: Optional[str] = Query(None, description="Book category"),
@@ -17,25 +32,29 @@ async def search_books(
     maxResults: int = Query(20, ge=1, le=40),
     startIndex: int = Query(0, ge=0),
     db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
 ):
     try:
-        results = await google_books_service.search_books(
-            query=query,
-            author=author,
-            category=category,
-            sort_by=sortBy,
-            max_results=maxResults,
-            start_index=startIndex,
-        )
+        search_params = {
+            "query": query,
+            "author": author,
+            "category": category,
+            "sort_by": sortBy,
+            "max_results": maxResults,
+            "start_index": startIndex,
+        }
+        results = await google_books_service.search_books(**search_params)
+        search_stats.record(search_params)
+        prefetch_next_page(search_params, results["totalItems"])
         
-        for book in results.get("items", []):
-            book_id = book["id"]
-            db_book = db.query(Book).filter(Book.id == book_id).first()
+        for book in results["items"]:
+            book_id = book.id
+            db_book = read_db.query(Book).filter(Book.id == book_id).first()
             
             if db_book:
-                book["popularity"] = db_book.popularity
-                book["stock"] = db_book.stock
-                book["availability"] = "available" if db_book.stock > 0 else "borrowed"
+                book.popularity = db_book.popularity
+                book.stock = db_book.stock
+                book.availability = "available" if db_book.stock > 0 else "borrowed"
             else:
                 new_book = Book(
                     id=book_id,
@@ -43,29 +62,46 @@ async def search_books(
                     stock=1,
                 )
                 db.add(new_book)
-                db.commit()
-                db.refresh(new_book)
+                try:
+                    db.commit()
+                    db.refresh(new_book)
+                except IntegrityError:
+                    # The replica had not seen this row yet; the primary has it.
+                    db.rollback()
+                    new_book = db.query(Book).filter(Book.id == book_id).first()
                 
-                book["popularity"] = new_book.popularity
-                book["stock"] = new_book.stock
-                book["availability"] = "available"
+                book.popularity = new_book.popularity
+                book.stock = new_book.stock
+                book.availability = "available" if new_book.stock > 0 else "borrowed"
         
-        return results
+        # The upstream version plus each item's stock and popularity cover
+        # everything in the enriched payload, so the ETag is derived without
+        # serializing it; a hit in the response cache then skips rendering.
+        version = results.pop("version", None)
+        etag = make_etag(
+            google_books_service.search_cache_key(**search_params),
+            version,
+            [(book.id, book.stock, book.popularity) for book in results["items"]],
+            results["totalItems"],
+        )
+        return await conditional_response(request, results, etag, settings.SEARCH_CACHE_CONTROL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to search books: {str(e)}")
 
 
-@router.get("/{book_id}")
-async def get_book(book_id: str, db: Session = Depends(get_db)):
+@router.get("/{book_id}", dependencies=[Depends(limit_client())])
+async def get_book(book_id: str, request: Request, db: Session = Depends(get_db)):
     try:
         book_data = await google_books_service.get_book(book_id)
+        metadata_etag = make_etag(book_data)
         
         db_book = db.query(Book).filter(Book.id == book_id).first()
         
         if db_book:
-            book_data["popularity"] = db_book.popularity
-            book_data["stock"] = db_book.stock
-            book_data["availability"] = "available" if db_book.stock > 0 else "borrowed"
+            book_data.popularity = db_book.popularity
+            book_data.stock = db_book.stock
+            book_data.availability = "available" if db_book.stock > 0 else "borrowed"
+            updated_at = db_book.updated_at
         else:
             new_book = Book(
                 id=book_id,
@@ -76,11 +112,71 @@ async def get_book(book_id: str, db: Session = Depends(get_db)):
             db.commit()
             db.refresh(new_book)
             
-            book_data["popularity"] = new_book.popularity
-            book_data["stock"] = new_book.stock
-            book_data["availability"] = "available"
+            book_data.popularity = new_book.popularity
+            book_data.stock = new_book.stock
+            book_data.availability = "available"
+            updated_at = new_book.updated_at
         
-        return book_data
+        # Metadata comes from the book cache on repeat views, so a matching
+        # If-None-Match is answered with a 304 without calling Google.
+        etag = make_etag(metadata_etag, book_data.stock, book_data.popularity, updated_at)
+        return await conditional_response(request, book_data, etag, settings.BOOK_CACHE_CONTROL)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Book not found: {str(e)}")
 
+
+@router.get("/{book_id}/cover", dependencies=[Depends(limit_concurrency(LOW))])
+async def get_book_cover(
+    book_id: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=16, le=2048, description="Target width in pixels"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security),
+):
+    async def resolve_url() -> str:
+        # Search results fill cover_url_cache, so the volume lookup (and the
+        # caller's rate limit) is only hit for books never seen in a search.
+        cover_url = await cover_url_cache.get(book_id)
+        if cover_url is None:
+            await check_client_rate(request, credentials, LOW)
+            try:
+                cover_url = (await google_books_service.get_book(book_id)).coverImage or ""
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 404:
+                    raise
+                await cover_url_cache.set(book_id, "", settings.COVER_MISSING_TTL_SECONDS)
+                raise HTTPException(status_code=404, detail="Book not found")
+        if not cover_url:
+            raise HTTPException(status_code=404, detail="Book has no cover image")
+        return cover_url
+    
+    try:
+        path, media_type, content_key = await cover_cache.get_cover(book_id, resolve_url, w)
+        if not os.path.exists(path):
+            # Evicted by another worker since it was looked up; fetch again.
+            path, media_type, content_key = await cover_cache.get_cover(book_id, resolve_url, w)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to fetch cover: {str(e)}")
+    
+    headers = {"ETag": f'"{content_key}"', "Cache-Control": settings.COVER_CACHE_CONTROL}
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get("/{book_id}/related")
+async def get_related(
+    book_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    read_db: Session = Depends(get_read_db),
+):
+    related = get_related_books(read_db, book_id, limit)
+    
+    # Metadata is only attached when it is already cached, so this endpoint
+    # never waits on Google.
+    books = await asyncio.gather(*(book_cache.get(related_id) for related_id, _ in related))
+    items = [
+        {"id": related_id, "score": score, "book": book}
+        for (related_id, score), book in zip(related, books)
+    ]
+    
+    return {"bookId": book_id, "items": items}
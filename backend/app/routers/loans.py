@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
 import uuid
 from app.firebase_auth import get_current_user
-from app.database import get_db
-from app.models import Loan, User, Book
+from app.idempotency import run_idempotent
+from app.database import get_db, get_read_db
+from app.models import ArchivedLoan, Loan, User, Book
+from app.rate_limit import CRITICAL, limit_user
+from app.services.loan_archive import loan_history
+from app.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 class LoanRequest(BaseModel):
@@ -24,12 +30,17 @@ class LoanResponse(BaseModel):
     status: str
 
 
-def ensure_user_exists(db: Session, user_id: str):
-    user = db.query(User).filter(User.id == user_id).first()
+def ensure_user_exists(db: Session, user_id: str, read_db: Optional[Session] = None):
+    user = (read_db or db).query(User).filter(User.id == user_id).first()
     if not user:
         user = User(id=user_id, email=f"{user_id}@placeholder.com", display_name="User")
         db.add(user)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # A lagging replica can miss a user that the primary already has.
+            db.rollback()
+            return db.query(User).filter(User.id == user_id).first()
         db.refresh(user)
     return user
 
@@ -51,11 +62,12 @@ def ensure_book_exists(db: Session, book_id: str):
 @router.get("", response_model=List[LoanResponse])
 async def get_my_loans(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
 ):
-    ensure_user_exists(db, current_user)
+    ensure_user_exists(db, current_user, read_db)
     
-    loans = db.query(Loan).filter(
+    loans = read_db.query(Loan).filter(
         Loan.user_id == current_user,
         Loan.status == "active"
     ).all()
@@ -73,12 +85,21 @@ async def get_my_loans(
     ]
 
 
-@router.post("", response_model=LoanResponse)
+@router.post("", response_model=LoanResponse, dependencies=[Depends(limit_user(CRITICAL))])
 async def borrow_book(
     loan_request: LoanRequest,
+    response: Response,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None),
 ):
+    return await run_idempotent(
+        "loans", current_user, idempotency_key, loan_request, response,
+        lambda: create_loan(db, current_user, loan_request),
+    )
+
+
+async def create_loan(db: Session, current_user: str, loan_request: LoanRequest) -> LoanResponse:
     ensure_user_exists(db, current_user)
     book = ensure_book_exists(db, loan_request.book_id)
     
@@ -126,7 +147,7 @@ async def borrow_book(
     )
 
 
-@router.put("/{loan_id}/return")
+@router.put("/{loan_id}/return", dependencies=[Depends(limit_user(CRITICAL))])
 async def return_book(
     loan_id: str,
     current_user: str = Depends(get_current_user),
@@ -161,6 +182,34 @@ async def return_book(
     }
 
 
+@router.get("/history", dependencies=[Depends(limit_user())])
+async def get_loan_history(
+    limit: int = Query(50, ge=1, le=200),
+    current_user: str = Depends(get_current_user),
+    read_db: Session = Depends(get_read_db)
+):
+    history = loan_history()
+    rows = read_db.execute(
+        select(history)
+        .where(history.c.user_id == current_user)
+        .order_by(history.c.borrowed_date.desc())
+        .limit(limit)
+    ).all()
+    
+    return [
+        {
+            "id": row.id,
+            "book_id": row.book_id,
+            "user_id": row.user_id,
+            "borrowed_date": row.borrowed_date.isoformat(),
+            "due_date": row.due_date.isoformat(),
+            "returned_date": row.returned_date.isoformat() if row.returned_date else None,
+            "status": row.status,
+        }
+        for row in rows
+    ]
+
+
 @router.get("/{loan_id}")
 async def get_loan(
     loan_id: str,
@@ -174,6 +223,12 @@ async def get_loan(
         Loan.user_id == current_user
     ).first()
     
+    if not loan:
+        loan = db.query(ArchivedLoan).filter(
+            ArchivedLoan.id == loan_id,
+            ArchivedLoan.user_id == current_user
+        ).first()
+    
     if not loan:
         raise HTTPException(status_code=404, detail="Loan not found")
     
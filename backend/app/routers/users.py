@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends
 from app.firebase_auth import get_current_user
+from app.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/me")
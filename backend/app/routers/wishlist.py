@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 import uuid
 from app.firebase_auth import get_current_user
-from app.database import get_db
+from app.idempotency import run_idempotent
+from app.database import get_db, get_read_db
 from app.models import WishListItem, User, Book
+from app.rate_limit import limit_user
+from app.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 class WishlistRequest(BaseModel):
@@ -29,12 +33,17 @@ class WishlistResponse(BaseModel):
     notifyWhenAvailable: bool
 
 
-def ensure_user_exists(db: Session, user_id: str):
-    user = db.query(User).filter(User.id == user_id).first()
+def ensure_user_exists(db: Session, user_id: str, read_db: Optional[Session] = None):
+    user = (read_db or db).query(User).filter(User.id == user_id).first()
     if not user:
         user = User(id=user_id, email=f"{user_id}@placeholder.com", display_name="User")
         db.add(user)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # A lagging replica can miss a user that the primary already has.
+            db.rollback()
+            return db.query(User).filter(User.id == user_id).first()
         db.refresh(user)
     return user
 
@@ -56,11 +65,12 @@ def ensure_book_exists(db: Session, book_id: str):
 @router.get("", response_model=List[WishlistResponse])
 async def get_wishlist(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
 ):
-    ensure_user_exists(db, current_user)
+    ensure_user_exists(db, current_user, read_db)
     
-    wishlist_items = db.query(WishListItem).filter(
+    wishlist_items = read_db.query(WishListItem).filter(
         WishListItem.user_id == current_user
     ).all()
     
@@ -80,11 +90,12 @@ async def get_wishlist(
 async def check_if_in_wishlist(
     book_id: str,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
 ):
-    ensure_user_exists(db, current_user)
+    ensure_user_exists(db, current_user, read_db)
     
-    item = db.query(WishListItem).filter(
+    item = read_db.query(WishListItem).filter(
         WishListItem.user_id == current_user,
         WishListItem.book_id == book_id
     ).first()
@@ -92,12 +103,21 @@ async def check_if_in_wishlist(
     return {"in_wishlist": item is not None}
 
 
-@router.post("", response_model=WishlistResponse)
+@router.post("", response_model=WishlistResponse, dependencies=[Depends(limit_user())])
 async def add_to_wishlist(
     request: WishlistRequestWithBook,
+    response: Response,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None),
 ):
+    return await run_idempotent(
+        "wishlist", current_user, idempotency_key, request, response,
+        lambda: create_wishlist_item(db, current_user, request),
+    )
+
+
+async def create_wishlist_item(db: Session, current_user: str, request: WishlistRequestWithBook) -> WishlistResponse:
     ensure_user_exists(db, current_user)
     ensure_book_exists(db, request.book_id)
     
@@ -129,7 +149,7 @@ async def add_to_wishlist(
     )
 
 
-@router.delete("/{book_id}")
+@router.delete("/{book_id}", dependencies=[Depends(limit_user())])
 async def remove_from_wishlist(
     book_id: str,
     current_user: str = Depends(get_current_user),
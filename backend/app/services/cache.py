@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import orjson
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from app.config import settings
+from app.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        raise NotImplementedError
+
+    # Sets the key only if it is absent or expired; returns whether it did.
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    # A WAL-mode SQLite file shared by every worker on the host and kept
+    # across restarts. Queries run in a thread to keep the event loop free.
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def _get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: bytes, ttl: int):
+        connection = self._connection()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl),
+        )
+        if random.random() < 0.001:
+            connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def _add(self, key: str, value: bytes, ttl: int) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE cache.expires_at <= ?",
+            (key, value, now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def _delete(self, key: str):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        return await asyncio.to_thread(self._add, key, value, ttl)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+
+class RedisCacheBackend(CacheBackend):
+    # Accepts any client speaking the redis.asyncio API, so a local stand-in
+    # such as fakeredis can be passed in place of a real server.
+    def __init__(self, url: Optional[str] = None, client=None):
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.from_url(url)
+        self.client = client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        await self.client.set(key, value, ex=ttl)
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        return bool(await self.client.set(key, value, ex=ttl, nx=True))
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+
+def create_cache_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(settings.CACHE_MEMORY_MAX_ENTRIES)
+    if settings.CACHE_BACKEND == "sqlite":
+        return SQLiteCacheBackend(settings.CACHE_SQLITE_PATH)
+    if settings.CACHE_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("REDIS_URL must be set when CACHE_BACKEND is 'redis'")
+        return RedisCacheBackend(settings.REDIS_URL)
+    raise ValueError(f"Unknown CACHE_BACKEND: {settings.CACHE_BACKEND}")
+
+
+class Cache:
+    def __init__(self, backend: CacheBackend, namespace: str, ttl: int):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{settings.CACHE_KEY_PREFIX}:{self.namespace}:{key}"
+
+    # Backend failures are treated as misses so an unavailable cache only
+    # costs latency, never a failed request.
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            raw = await self.backend.get(self._key(key))
+        except Exception as e:
+            logger.warning("Cache get failed", extra={"cache": self.namespace, "error": str(e)})
+            raw = None
+        record_cache(self.namespace, raw is not None)
+        return raw
+
+    async def set_bytes(self, key: str, value: bytes, ttl: Optional[int] = None):
+        try:
+            await self.backend.set(self._key(key), value, ttl or self.ttl)
+        except Exception as e:
+            logger.warning("Cache set failed", extra={"cache": self.namespace, "error": str(e)})
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.get_bytes(key)
+        return orjson.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        await self.set_bytes(key, orjson.dumps(value), ttl)
+
+    # When the backend is unavailable the caller proceeds as if it had won,
+    # matching the miss-on-error behaviour of get.
+    async def add(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        try:
+            return await self.backend.add(self._key(key), orjson.dumps(value), ttl or self.ttl)
+        except Exception as e:
+            logger.warning("Cache add failed", extra={"cache": self.namespace, "error": str(e)})
+            return True
+
+    async def delete(self, key: str):
+        try:
+            await self.backend.delete(self._key(key))
+        except Exception as e:
+            logger.warning("Cache delete failed", extra={"cache": self.namespace, "error": str(e)})
+
+
+cache_backend = create_cache_backend()
+
+book_cache = Cache(cache_backend, "book", settings.CACHE_BOOK_TTL_SECONDS)
+search_cache = Cache(cache_backend, "search", settings.CACHE_SEARCH_TTL_SECONDS)
+token_cache = Cache(cache_backend, "token", settings.CACHE_TOKEN_TTL_SECONDS)
+response_cache = Cache(cache_backend, "response", settings.CACHE_RESPONSE_TTL_SECONDS)
+# Book id -> cover image URL ("" when the book has none), filled from search
+# results so cover requests do not need a volume lookup.
+cover_url_cache = Cache(cache_backend, "cover_url", settings.CACHE_BOOK_TTL_SECONDS)
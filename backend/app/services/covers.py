@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+from app.config import settings
+from app.services.google_books import google_books_service
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_STRIPES = 64
+# Blobs served this recently are never evicted, so a path handed to a
+# response is still on disk when the file is sent.
+EVICTION_GRACE_SECONDS = 60
+
+
+class CoverCache:
+    # Blobs are stored under the sha256 of their content; refs/ maps the
+    # sha256 of a book id to the content hash and media type of its
+    # original, so a cached cover is served without resolving its URL.
+    # Resized variants are named after the original's hash and the target
+    # width, so every file on disk is immutable once written.
+    def __init__(self, directory: str, max_bytes: int, widths: List[int]):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.widths = sorted(widths)
+        self._locks = [asyncio.Lock() for _ in range(LOCK_STRIPES)]
+        self._fetches = asyncio.Semaphore(settings.COVER_FETCH_CONCURRENCY)
+        self._size: Optional[int] = None
+        # Size accounting runs in to_thread workers.
+        self._size_lock = threading.Lock()
+
+    def _blob_path(self, name: str) -> str:
+        return os.path.join(self.directory, "blobs", name[:2], name)
+
+    def _ref_path(self, ref_key: str) -> str:
+        return os.path.join(self.directory, "refs", ref_key[:2], ref_key)
+
+    def _snap_width(self, width: int) -> int:
+        for candidate in self.widths:
+            if candidate >= width:
+                return candidate
+        return self.widths[-1]
+
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_ref(self, ref_key: str) -> Optional[Tuple[str, str]]:
+        try:
+            with open(self._ref_path(ref_key)) as f:
+                content_hash, media_type = f.read().split(" ", 1)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not self._touch(self._blob_path(content_hash)):
+            return None
+        return content_hash, media_type
+
+    def _touch(self, path: str) -> bool:
+        # mtime doubles as the last-access time used for eviction.
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _store_original(self, ref_key: str, body: bytes, media_type: str) -> str:
+        content_hash = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(content_hash)
+        if not os.path.exists(path):
+            self._write_atomic(path, body)
+            self._account(len(body))
+        self._write_atomic(self._ref_path(ref_key), f"{content_hash} {media_type}".encode())
+        return content_hash
+
+    def _resize(self, content_hash: str, width: int) -> str:
+        original = self._blob_path(content_hash)
+        variant = self._blob_path(f"{content_hash}-w{width}")
+        if self._touch(variant):
+            return variant
+        if Image is None:
+            return original
+        with Image.open(original) as image:
+            if image.width <= width:
+                return original
+            image_format = image.format
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+        os.makedirs(os.path.dirname(variant), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(variant))
+        with os.fdopen(fd, "wb") as f:
+            if image_format == "JPEG":
+                resized.save(f, format="JPEG", quality=85, optimize=True, progressive=True)
+            else:
+                resized.save(f, format=image_format, optimize=True)
+        os.replace(tmp_path, variant)
+        self._account(os.path.getsize(variant))
+        return variant
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(os.path.join(self.directory, "blobs")):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _account(self, added: int):
+        with self._size_lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += added
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Drop least recently served blobs until 90% of the budget is free.
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        recent = time.time() - EVICTION_GRACE_SECONDS
+        for mtime, size, path in entries:
+            if total <= target or mtime > recent:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._size = total
+        logger.info("Evicted cover cache entries", extra={"cache_bytes": total})
+
+    async def get_cover(
+        self,
+        book_id: str,
+        resolve_url: Callable[[], Awaitable[str]],
+        width: Optional[int] = None,
+    ) -> Tuple[str, str, str]:
+        # resolve_url is only awaited on a miss.
+        ref_key = hashlib.sha256(book_id.encode()).hexdigest()
+        async with self._locks[int(ref_key[:8], 16) % LOCK_STRIPES]:
+            ref = await asyncio.to_thread(self._read_ref, ref_key)
+            if ref is None:
+                url = await resolve_url()
+                async with self._fetches:
+                    body, media_type = await google_books_service.fetch_cover(url)
+                content_hash = await asyncio.to_thread(self._store_original, ref_key, body, media_type)
+            else:
+                content_hash, media_type = ref
+
+            if width is None:
+                return self._blob_path(content_hash), media_type, content_hash
+            snapped = self._snap_width(width)
+            path = await asyncio.to_thread(self._resize, content_hash, snapped)
+            return path, media_type, f"{content_hash}-w{snapped}"
+
+
+cover_cache = CoverCache(
+    settings.COVER_CACHE_DIR,
+    settings.COVER_CACHE_MAX_BYTES,
+    [int(width) for width in settings.COVER_WIDTHS.split(",")],
+)
@@ -1,24 +1,62 @@
+import asyncio
+import hashlib
 import httpx
-from typing import List, Dict, Any, Optional
+import logging
+import orjson
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
 from app.config import settings
+from app.metrics import observe_google_books
+from app.services.cache import book_cache, cover_url_cache, search_cache
+from app.timing import add_timing
+
+logger = logging.getLogger(__name__)
+
+
+# Field names match the JSON the frontend consumes, so records are handed
+# to orjson as-is instead of being copied into per-item dicts.
+@dataclass(slots=True)
+class BookRecord:
+    id: str
+    title: str = "Unknown Title"
+    authors: List[str] = field(default_factory=list)
+    description: Optional[str] = None
+    coverImage: Optional[str] = None
+    categories: List[str] = field(default_factory=list)
+    publishedDate: Optional[str] = None
+    pageCount: Optional[int] = None
+    language: Optional[str] = None
+    publisher: Optional[str] = None
+    isbn: Optional[str] = None
+    averageRating: Optional[float] = None
+    ratingsCount: Optional[int] = None
+    previewLink: Optional[str] = None
+    infoLink: Optional[str] = None
+    availability: str = "available"
+    popularity: Optional[int] = None
+    stock: Optional[int] = None
 
 
 class GoogleBooksService:
     def __init__(self):
         self.base_url = settings.GOOGLE_BOOKS_API_URL
         self.api_key = settings.GOOGLE_BOOKS_API_KEY
+        self._client: Optional[httpx.AsyncClient] = None
 
-    async def search_books(
-        self,
-        query: Optional[str] = None,
-        author: Optional[str] = None,
-        category: Optional[str] = None,
-        sort_by: str = "relevance",
-        max_results: int = 20,
-        start_index: int = 0,
-    ) -> Dict[str, Any]:
-        print(f"DEBUG: search_books called with query='{query}', author='{author}', category='{category}', sort_by='{sort_by}'")
-        
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # One pooled client per process so connections to Google are reused.
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _search_query(self, query: Optional[str], author: Optional[str], category: Optional[str]) -> str:
         search_terms = []
         if query:
             search_terms.append(query)
@@ -28,11 +66,47 @@ class GoogleBooksService:
             search_terms.append(f"subject:{category}")
 
         search_query = " ".join(search_terms) if search_terms else ""
-        print(f"DEBUG: Final search query: '{search_query}'")
 
         if not search_query:
-            print("DEBUG: No search query, showing newest books as default")
             search_query = "a"
+        return search_query
+
+    def search_cache_key(
+        self,
+        query: Optional[str] = None,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        sort_by: str = "relevance",
+        max_results: int = 20,
+        start_index: int = 0,
+    ) -> str:
+        search_query = self._search_query(query, author, category)
+        return f"{search_query}|{sort_by}|{min(max_results, 40)}|{start_index}"
+
+    async def search_books(
+        self,
+        query: Optional[str] = None,
+        author: Optional[str] = None,
+        category: Optional[str] = None,
+        sort_by: str = "relevance",
+        max_results: int = 20,
+        start_index: int = 0,
+    ) -> Dict[str, Any]:
+        search_query = self._search_query(query, author, category)
+
+        logger.debug(
+            "searching Google Books",
+            extra={"search_query": search_query, "sort_by": sort_by, "start_index": start_index},
+        )
+
+        cache_key = self.search_cache_key(query, author, category, sort_by, max_results, start_index)
+        cached = await search_cache.get(cache_key)
+        if cached is not None:
+            return {
+                "items": [BookRecord(**item) for item in cached["items"]],
+                "totalItems": cached["totalItems"],
+                "version": cached.get("version"),
+            }
 
         params = {
             "q": search_query,
@@ -45,43 +119,65 @@ class GoogleBooksService:
         if self.api_key:
             params["key"] = self.api_key
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/volumes",
-                params=params,
-                timeout=10.0,
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await self._get("volumes", f"{self.base_url}/volumes", params)
+        data = orjson.loads(response.content)
 
         items = []
         for item in data.get("items", []):
             volume_info = item.get("volumeInfo", {})
             items.append(self._transform_book(item["id"], volume_info))
 
-        return {
+        # version identifies this upstream response, so callers can derive
+        # validators without serializing the items again.
+        result = {
             "items": items,
             "totalItems": data.get("totalItems", 0),
+            "version": hashlib.sha256(response.content).hexdigest()[:16],
         }
+        await search_cache.set(cache_key, result)
+        await asyncio.gather(*(cover_url_cache.set(item.id, item.coverImage or "") for item in items))
+        return result
+
+    async def get_book(self, book_id: str) -> BookRecord:
+        cached = await book_cache.get(book_id)
+        if cached is not None:
+            return BookRecord(**cached)
 
-    async def get_book(self, book_id: str) -> Dict[str, Any]:
         params = {}
         if self.api_key:
             params["key"] = self.api_key
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/volumes/{book_id}",
-                params=params,
-                timeout=10.0,
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await self._get("volume", f"{self.base_url}/volumes/{book_id}", params)
+        data = orjson.loads(response.content)
 
         volume_info = data.get("volumeInfo", {})
-        return self._transform_book(data["id"], volume_info)
+        book = self._transform_book(data["id"], volume_info)
+        await book_cache.set(book_id, book)
+        await cover_url_cache.set(book_id, book.coverImage or "")
+        return book
+
+    async def fetch_cover(self, url: str) -> Tuple[bytes, str]:
+        response = await self._get("cover", url, {})
+        return response.content, response.headers.get("content-type", "image/jpeg")
+
+    async def _get(self, endpoint: str, url: str, params: Dict[str, Any]) -> httpx.Response:
+        status = "error"
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(url, params=params)
+            status = str(response.status_code)
+            response.raise_for_status()
+            return response
+        finally:
+            duration = time.perf_counter() - start
+            observe_google_books(endpoint, status, duration)
+            add_timing("google", duration)
+            logger.debug(
+                "Google Books request finished",
+                extra={"endpoint": endpoint, "status": status, "duration_ms": round(duration * 1000, 2)},
+            )
 
-    def _transform_book(self, book_id: str, volume_info: Dict) -> Dict[str, Any]:
+    def _transform_book(self, book_id: str, volume_info: Dict) -> BookRecord:
         image_links = volume_info.get("imageLinks", {})
         cover_image = (
             image_links.get("large")
@@ -99,24 +195,23 @@ class GoogleBooksService:
                 isbn = identifier.get("identifier")
                 break
 
-        return {
-            "id": book_id,
-            "title": volume_info.get("title", "Unknown Title"),
-            "authors": volume_info.get("authors", []),
-            "description": volume_info.get("description"),
-            "coverImage": cover_image,
-            "categories": volume_info.get("categories", []),
-            "publishedDate": volume_info.get("publishedDate"),
-            "pageCount": volume_info.get("pageCount"),
-            "language": volume_info.get("language"),
-            "publisher": volume_info.get("publisher"),
-            "isbn": isbn,
-            "averageRating": volume_info.get("averageRating"),
-            "ratingsCount": volume_info.get("ratingsCount"),
-            "previewLink": volume_info.get("previewLink"),
-            "infoLink": volume_info.get("infoLink"),
-            "availability": "available",
-        }
+        return BookRecord(
+            id=book_id,
+            title=volume_info.get("title", "Unknown Title"),
+            authors=volume_info.get("authors", []),
+            description=volume_info.get("description"),
+            coverImage=cover_image,
+            categories=volume_info.get("categories", []),
+            publishedDate=volume_info.get("publishedDate"),
+            pageCount=volume_info.get("pageCount"),
+            language=volume_info.get("language"),
+            publisher=volume_info.get("publisher"),
+            isbn=isbn,
+            averageRating=volume_info.get("averageRating"),
+            ratingsCount=volume_info.get("ratingsCount"),
+            previewLink=volume_info.get("previewLink"),
+            infoLink=volume_info.get("infoLink"),
+        )
 
 
 google_books_service = GoogleBooksService()
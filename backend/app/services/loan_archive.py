@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, get_engine
+from app.models import ArchivedLoan, Loan
+
+logger = logging.getLogger(__name__)
+
+LOAN_COLUMNS = ("id", "user_id", "book_id", "borrowed_date", "due_date", "returned_date", "status")
+
+
+def loan_history():
+    # Loans from both the hot table and the archive, for queries that need
+    # the full history rather than only active or recent loans.
+    return union_all(
+        select(*(getattr(Loan, column) for column in LOAN_COLUMNS)),
+        select(*(getattr(ArchivedLoan, column) for column in LOAN_COLUMNS)),
+    ).subquery("loan_history")
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    # SKIP LOCKED lets several workers run the job without archiving the
+    # same rows twice; it is ignored on databases without row locks.
+    ids = db.execute(
+        select(Loan.id)
+        .where(Loan.status == "returned", Loan.returned_date < cutoff)
+        .order_by(Loan.returned_date)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not ids:
+        db.rollback()
+        return 0
+
+    db.execute(
+        insert(ArchivedLoan).from_select(
+            [*LOAN_COLUMNS, "archived_at"],
+            select(*(getattr(Loan, column) for column in LOAN_COLUMNS), literal(datetime.utcnow()))
+            .where(Loan.id.in_(ids)),
+        )
+    )
+    db.execute(delete(Loan).where(Loan.id.in_(ids)))
+    db.commit()
+    return len(ids)
+
+
+def archive_returned_loans() -> int:
+    get_engine()
+    cutoff = datetime.utcnow() - timedelta(days=settings.LOAN_ARCHIVE_AFTER_DAYS)
+    archived = 0
+    db = SessionLocal()
+    try:
+        while True:
+            moved = archive_batch(db, cutoff, settings.LOAN_ARCHIVE_BATCH_SIZE)
+            archived += moved
+            if moved < settings.LOAN_ARCHIVE_BATCH_SIZE:
+                return archived
+    finally:
+        db.close()
+
+
+async def run_loan_archiver(ready: asyncio.Event):
+    await ready.wait()
+    while True:
+        try:
+            archived = await asyncio.to_thread(archive_returned_loans)
+            if archived:
+                logger.info("Archived returned loans", extra={"archived": archived})
+        except Exception:
+            logger.exception("Loan archival failed")
+        await asyncio.sleep(settings.LOAN_ARCHIVE_INTERVAL_SECONDS)
@@ -0,0 +1,184 @@
+import asyncio
+import heapq
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, get_engine
+from app.models import BookCooccurrence, BookRecommendation, RecommendationState
+from app.services.loan_archive import loan_history
+
+logger = logging.getLogger(__name__)
+
+# Loans younger than this are left for the next run, so rows committed
+# slightly out of borrowed_date order are not skipped by the watermark.
+SETTLE_DELAY = timedelta(minutes=1)
+IN_CHUNK = 500
+
+
+def _chunks(values: List[str]):
+    for start in range(0, len(values), IN_CHUNK):
+        yield values[start:start + IN_CHUNK]
+
+
+def _lock_state(db: Session) -> Optional[RecommendationState]:
+    # Only one worker advances the watermark at a time; the others skip.
+    state = db.execute(
+        select(RecommendationState)
+        .where(RecommendationState.id == 1)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if state is not None:
+        return state
+    if db.get(RecommendationState, 1) is not None:
+        return None
+    db.add(RecommendationState(id=1))
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        return None
+    return db.get(RecommendationState, 1)
+
+
+def _after_watermark(history, state: RecommendationState):
+    if state.last_borrowed_date is None:
+        return True
+    return or_(
+        history.c.borrowed_date > state.last_borrowed_date,
+        and_(history.c.borrowed_date == state.last_borrowed_date, history.c.id > state.last_loan_id),
+    )
+
+
+def _seen_books(db: Session, history, state: RecommendationState, user_ids: List[str]) -> Dict[str, Set[str]]:
+    seen = defaultdict(set)
+    if state.last_borrowed_date is None:
+        return seen
+    for chunk in _chunks(user_ids):
+        rows = db.execute(
+            select(history.c.user_id, history.c.book_id)
+            .where(history.c.user_id.in_(chunk))
+            .where(~_after_watermark(history, state))
+            .distinct()
+        ).all()
+        for user_id, book_id in rows:
+            seen[user_id].add(book_id)
+    return seen
+
+
+def process_batch(db: Session, batch_size: int, top_k: int) -> int:
+    state = _lock_state(db)
+    if state is None:
+        return 0
+
+    history = loan_history()
+    loans = db.execute(
+        select(history.c.id, history.c.user_id, history.c.book_id, history.c.borrowed_date)
+        .where(history.c.borrowed_date < datetime.utcnow() - SETTLE_DELAY)
+        .where(_after_watermark(history, state))
+        .order_by(history.c.borrowed_date, history.c.id)
+        .limit(batch_size)
+    ).all()
+    if not loans:
+        db.rollback()
+        return 0
+
+    # Each first borrow of a book by a user pairs it with every book that
+    # user borrowed before; repeat borrows add nothing.
+    seen = _seen_books(db, history, state, sorted({loan.user_id for loan in loans}))
+    increments = Counter()
+    for loan in loans:
+        books = seen[loan.user_id]
+        if loan.book_id in books:
+            continue
+        for other in books:
+            increments[(loan.book_id, other)] += 1
+            increments[(other, loan.book_id)] += 1
+        books.add(loan.book_id)
+
+    if increments:
+        _apply_increments(db, increments, top_k)
+
+    state.last_borrowed_date = loans[-1].borrowed_date
+    state.last_loan_id = loans[-1].id
+    db.commit()
+    return len(loans)
+
+
+def _apply_increments(db: Session, increments: Counter, top_k: int):
+    affected = sorted({book_id for book_id, _ in increments})
+    counts: Dict[str, Dict[str, int]] = defaultdict(dict)
+    for chunk in _chunks(affected):
+        rows = db.execute(
+            select(BookCooccurrence.book_id, BookCooccurrence.other_book_id, BookCooccurrence.count)
+            .where(BookCooccurrence.book_id.in_(chunk))
+        ).all()
+        for book_id, other_book_id, count in rows:
+            counts[book_id][other_book_id] = count
+
+    updates, inserts = [], []
+    for (book_id, other_book_id), delta in increments.items():
+        row = {"book_id": book_id, "other_book_id": other_book_id}
+        if other_book_id in counts[book_id]:
+            counts[book_id][other_book_id] += delta
+            updates.append({**row, "count": counts[book_id][other_book_id]})
+        else:
+            counts[book_id][other_book_id] = delta
+            inserts.append({**row, "count": delta})
+    if updates:
+        db.execute(update(BookCooccurrence), updates)
+    if inserts:
+        db.execute(insert(BookCooccurrence), inserts)
+
+    now = datetime.utcnow()
+    recommendations = [
+        {
+            "book_id": book_id,
+            "related": [
+                [other_book_id, count]
+                for other_book_id, count in heapq.nlargest(
+                    top_k, counts[book_id].items(), key=lambda item: (item[1], item[0])
+                )
+            ],
+            "updated_at": now,
+        }
+        for book_id in affected
+    ]
+    for chunk in _chunks(affected):
+        db.execute(delete(BookRecommendation).where(BookRecommendation.book_id.in_(chunk)))
+    db.execute(insert(BookRecommendation), recommendations)
+
+
+def update_recommendations() -> int:
+    get_engine()
+    processed = 0
+    db = SessionLocal()
+    try:
+        while True:
+            count = process_batch(db, settings.RECOMMENDATIONS_BATCH_SIZE, settings.RECOMMENDATIONS_TOP_K)
+            processed += count
+            if count < settings.RECOMMENDATIONS_BATCH_SIZE:
+                return processed
+    finally:
+        db.close()
+
+
+def get_related_books(db: Session, book_id: str, limit: int) -> List[List]:
+    recommendation = db.get(BookRecommendation, book_id)
+    return recommendation.related[:limit] if recommendation else []
+
+
+async def run_recommendation_updater(ready: asyncio.Event):
+    await ready.wait()
+    while True:
+        try:
+            processed = await asyncio.to_thread(update_recommendations)
+            if processed:
+                logger.info("Updated book recommendations", extra={"loans_processed": processed})
+        except Exception:
+            logger.exception("Recommendation update failed")
+        await asyncio.sleep(settings.RECOMMENDATIONS_INTERVAL_SECONDS)
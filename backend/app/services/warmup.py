@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
+import orjson
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import SessionLocal, get_engine
+from app.models import Book, SearchStat
+from app.rate_limit import TokenBuckets, admission
+from app.services.cache import search_cache
+from app.services.google_books import google_books_service
+
+logger = logging.getLogger(__name__)
+
+
+class SearchStats:
+    # Counts searches in memory and adds them to per-day rows in
+    # search_stats on each flush, so the hot path never writes to the DB.
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._params: Dict[str, dict] = {}
+
+    def record(self, params: dict):
+        key = hashlib.sha256(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        self._counts[key] += 1
+        self._params[key] = params
+
+    def _write(self, counts: Counter, params: Dict[str, dict]):
+        today = datetime.utcnow().date()
+        db = SessionLocal()
+        try:
+            # A concurrent flush from another worker can insert the same
+            # row first; the retry then finds it and updates instead.
+            for attempt in range(2):
+                try:
+                    for key, count in counts.items():
+                        updated = db.execute(
+                            update(SearchStat)
+                            .where(SearchStat.search_key == key, SearchStat.day == today)
+                            .values(count=SearchStat.count + count)
+                        ).rowcount
+                        if not updated:
+                            db.add(SearchStat(search_key=key, day=today, params=params[key], count=count))
+                            db.flush()
+                    db.execute(
+                        delete(SearchStat)
+                        .where(SearchStat.day < today - timedelta(days=settings.WARMUP_SEARCH_WINDOW_DAYS))
+                    )
+                    db.commit()
+                    return
+                except IntegrityError:
+                    db.rollback()
+                    if attempt:
+                        raise
+        finally:
+            db.close()
+
+    async def flush(self):
+        counts, params = self._counts, self._params
+        self._counts, self._params = Counter(), {}
+        if counts:
+            await asyncio.to_thread(self._write, counts, params)
+
+
+search_stats = SearchStats()
+
+
+def _load_targets() -> Tuple[List[str], List[dict]]:
+    get_engine()
+    db = SessionLocal()
+    try:
+        book_ids = db.execute(
+            select(Book.id)
+            .where(Book.popularity > 0)
+            .order_by(Book.popularity.desc())
+            .limit(settings.WARMUP_TOP_BOOKS)
+        ).scalars().all()
+        since = datetime.utcnow().date() - timedelta(days=settings.WARMUP_SEARCH_WINDOW_DAYS)
+        total = func.sum(SearchStat.count)
+        keys = db.execute(
+            select(SearchStat.search_key)
+            .where(SearchStat.day >= since)
+            .group_by(SearchStat.search_key)
+            .order_by(total.desc())
+            .limit(settings.WARMUP_TOP_SEARCHES)
+        ).scalars().all()
+        searches = []
+        if keys:
+            params = dict(db.execute(
+                select(SearchStat.search_key, SearchStat.params).where(SearchStat.search_key.in_(keys))
+            ).all())
+            searches = [params[key] for key in keys]
+        return book_ids, searches
+    finally:
+        db.close()
+
+
+async def warm_caches() -> Tuple[int, int]:
+    # Already-cached entries are hits in GoogleBooksService, so with a
+    # persistent cache backend only what expired goes to Google.
+    book_ids, searches = await asyncio.to_thread(_load_targets)
+    semaphore = asyncio.Semaphore(settings.WARMUP_CONCURRENCY)
+
+    async def run(call):
+        async with semaphore:
+            try:
+                await call()
+                return True
+            except Exception as e:
+                logger.debug("Cache warm-up request failed", extra={"error": str(e)})
+                return False
+
+    results = await asyncio.gather(
+        *(run(lambda book_id=book_id: google_books_service.get_book(book_id)) for book_id in book_ids),
+        *(run(lambda params=params: google_books_service.search_books(**params)) for params in searches),
+    )
+    return len(results), sum(results)
+
+
+async def run_search_stats_flusher(ready: asyncio.Event):
+    await ready.wait()
+    try:
+        while True:
+            await asyncio.sleep(settings.SEARCH_STATS_FLUSH_SECONDS)
+            try:
+                await search_stats.flush()
+            except Exception:
+                logger.exception("Search stats flush failed")
+    finally:
+        # Keep what was counted before shutdown for the next warm-up.
+        await search_stats.flush()
+
+
+prefetch_budget = TokenBuckets(settings.SEARCH_PREFETCH_PER_MINUTE, settings.SEARCH_PREFETCH_BURST, 1)
+_prefetching: Set[str] = set()
+_prefetch_tasks: Set[asyncio.Task] = set()
+
+
+async def _prefetch(cache_key: str, params: dict):
+    try:
+        if await search_cache.get_bytes(cache_key) is not None:
+            return
+        # Spend upstream budget only on pages that would reach Google.
+        if prefetch_budget.take("google") > 0:
+            return
+        await google_books_service.search_books(**params)
+    except Exception as e:
+        logger.debug("Search prefetch failed", extra={"error": str(e)})
+    finally:
+        _prefetching.discard(cache_key)
+
+
+def prefetch_next_page(params: dict, total_items: int):
+    # Fire-and-forget fetch of the following page. Skipped while requests
+    # are queueing for admission so prefetch never competes with users.
+    if settings.SEARCH_PREFETCH_PER_MINUTE <= 0 or admission.queued:
+        return
+    next_params = {**params, "start_index": params["start_index"] + params["max_results"]}
+    if next_params["start_index"] >= total_items:
+        return
+    cache_key = google_books_service.search_cache_key(**next_params)
+    if cache_key in _prefetching:
+        return
+    _prefetching.add(cache_key)
+    task = asyncio.create_task(_prefetch(cache_key, next_params))
+    _prefetch_tasks.add(task)
+    task.add_done_callback(_prefetch_tasks.discard)
+
+
+async def cancel_prefetches():
+    tasks = list(_prefetch_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,102 @@
+import asyncio
+import firebase_admin
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict
+from app.database import check_database, create_tables
+from app.firebase_auth import initialize_firebase
+from app.config import settings
+from app.logging_config import configure_logging
+from app.metrics import mark_process_dead
+from app.services.google_books import google_books_service
+from app.services.loan_archive import run_loan_archiver
+from app.services.recommendations import run_recommendation_updater
+from app.services.warmup import cancel_prefetches, run_search_stats_flusher, warm_caches
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    def __init__(self):
+        self.components: Dict[str, str] = {}
+
+    def set(self, component: str, status: str):
+        self.components[component] = status
+
+
+readiness = Readiness()
+
+
+async def _initialize_firebase():
+    readiness.set("firebase", "pending")
+    await asyncio.to_thread(initialize_firebase)
+    readiness.set("firebase", "ok" if firebase_admin._apps else "error")
+
+
+async def _initialize_database(database_ready: asyncio.Event):
+    readiness.set("database", "pending")
+    delay = 1.0
+    while True:
+        try:
+            await asyncio.to_thread(create_tables)
+            readiness.set("database", "ok")
+            database_ready.set()
+            return
+        except Exception as e:
+            logger.warning("Database initialization failed, retrying", extra={"error": str(e), "retry_in": delay})
+            readiness.set("database", "error")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+async def _warm_caches(database_ready: asyncio.Event):
+    # Reported as a readiness component so a new instance only takes
+    # traffic once its caches are warm, or the warm-up timed out.
+    readiness.set("cache", "pending")
+    await database_ready.wait()
+    try:
+        requested, warmed = await asyncio.wait_for(warm_caches(), settings.WARMUP_TIMEOUT_SECONDS)
+        logger.info("Cache warm-up finished", extra={"requested": requested, "warmed": warmed})
+    except asyncio.TimeoutError:
+        logger.warning("Cache warm-up timed out", extra={"timeout": settings.WARMUP_TIMEOUT_SECONDS})
+    except Exception:
+        logger.exception("Cache warm-up failed")
+    readiness.set("cache", "ok")
+
+
+async def check_readiness() -> Dict[str, str]:
+    components = dict(readiness.components)
+    if components.get("database") == "ok":
+        try:
+            await asyncio.wait_for(asyncio.to_thread(check_database), timeout=2.0)
+        except Exception:
+            components["database"] = "unreachable"
+    return components
+
+
+# Firebase credentials and the schema check run concurrently in the
+# background, so the worker starts serving /health immediately and /ready
+# reports when each dependency is usable.
+@asynccontextmanager
+async def lifespan(app):
+    configure_logging()
+    database_ready = asyncio.Event()
+    tasks = [
+        asyncio.create_task(_initialize_firebase()),
+        asyncio.create_task(_initialize_database(database_ready)),
+    ]
+    if settings.LOAN_ARCHIVE_AFTER_DAYS > 0:
+        tasks.append(asyncio.create_task(run_loan_archiver(database_ready)))
+    if settings.RECOMMENDATIONS_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(run_recommendation_updater(database_ready)))
+    if settings.WARMUP_ENABLED:
+        tasks.append(asyncio.create_task(_warm_caches(database_ready)))
+    tasks.append(asyncio.create_task(run_search_stats_flusher(database_ready)))
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Prefetches use the Google client, so they must finish before it closes.
+    await cancel_prefetches()
+    await google_books_service.close()
+    mark_process_dead()
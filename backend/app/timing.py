@@ -0,0 +1,108 @@
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from fastapi.routing import APIRoute
+
+
+# Phases that endpoints may time themselves, e.g. when they render a
+# response body directly; they are reported apart from "app".
+RESPONSE_PHASES = ("serialize", "compress")
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, name: str, duration: float):
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    def response_phases(self) -> float:
+        return sum(self.spans.get(name, 0.0) for name in RESPONSE_PHASES)
+
+    def header_value(self, response_started: float) -> str:
+        spans = dict(self.spans)
+        if self.endpoint_finished is not None:
+            spans["serialize"] = spans.get("serialize", 0.0) + response_started - self.endpoint_finished
+        spans["total"] = response_started - self.start
+        return ", ".join(
+            f"{name};dur={duration * 1000:.1f}" for name, duration in spans.items()
+        )
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+def add_timing(name: str, duration: float):
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(name, duration)
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - start)
+
+
+class TimedRoute(APIRoute):
+    # Wraps the endpoint so the time between the handler returning and the
+    # response starting can be reported as the serialization phase.
+    def __init__(self, path, endpoint, **kwargs):
+        # include_router() re-creates routes from already wrapped endpoints.
+        if asyncio.iscoroutinefunction(endpoint) and not hasattr(endpoint, "_timed"):
+            endpoint = self._wrap_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _wrap_endpoint(endpoint):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **kwargs):
+            timings = _current_timings.get()
+            start = time.perf_counter()
+            phases = timings.response_phases() if timings is not None else 0.0
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.endpoint_finished = time.perf_counter()
+                    in_endpoint = timings.response_phases() - phases
+                    timings.add("app", timings.endpoint_finished - start - in_endpoint)
+
+        timed_endpoint._timed = True
+        return timed_endpoint
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                value = timings.header_value(time.perf_counter())
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", value.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timings.reset(token)
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import random
+import zlib
+from fastapi import FastAPI, HTTPException, Query
+
+# Stand-in for the Google Books volumes API. Latency and failure rate are
+# injected through the environment so benchmark runs are reproducible.
+CATALOG_SIZE = int(os.getenv("FAKE_GOOGLE_CATALOG_SIZE", "5000"))
+LATENCY_MS = float(os.getenv("FAKE_GOOGLE_LATENCY_MS", "80"))
+JITTER_MS = float(os.getenv("FAKE_GOOGLE_JITTER_MS", "20"))
+ERROR_RATE = float(os.getenv("FAKE_GOOGLE_ERROR_RATE", "0"))
+
+CATEGORIES = ["Fiction", "History", "Science", "Computers", "Poetry", "Biography"]
+DESCRIPTION = (
+    "A long-form description of the volume, roughly the size Google returns "
+    "for popular titles, repeated to keep payload sizes realistic. "
+) * 8
+
+app = FastAPI()
+rng = random.Random(int(os.getenv("FAKE_GOOGLE_SEED", "0")))
+
+
+def volume_id(n: int) -> str:
+    return f"vol-{n % CATALOG_SIZE:05d}"
+
+
+def make_volume(book_id: str) -> dict:
+    n = int(book_id.split("-")[1])
+    return {
+        "kind": "books#volume",
+        "id": book_id,
+        "etag": f"etag{n}",
+        "selfLink": f"https://www.googleapis.com/books/v1/volumes/{book_id}",
+        "volumeInfo": {
+            "title": f"Benchmark Book {n}",
+            "authors": [f"Author {n % 97}", f"Author {n % 31}"],
+            "publisher": f"Publisher {n % 13}",
+            "publishedDate": f"{1950 + n % 70}-01-01",
+            "description": DESCRIPTION,
+            "industryIdentifiers": [
+                {"type": "ISBN_13", "identifier": f"978{n:010d}"},
+                {"type": "ISBN_10", "identifier": f"{n:010d}"},
+            ],
+            "pageCount": 100 + n % 600,
+            "printType": "BOOK",
+            "categories": [CATEGORIES[n % len(CATEGORIES)]],
+            "averageRating": 1 + n % 5,
+            "ratingsCount": n % 1000,
+            "language": "en",
+            "imageLinks": {
+                "smallThumbnail": f"http://books.google.com/books/content?id={book_id}&zoom=5",
+                "thumbnail": f"http://books.google.com/books/content?id={book_id}&zoom=1",
+            },
+            "previewLink": f"http://books.google.com/books?id={book_id}",
+            "infoLink": f"http://books.google.com/books?id={book_id}&source=gbs_api",
+        },
+        "saleInfo": {"country": "US", "saleability": "NOT_FOR_SALE"},
+        "accessInfo": {"country": "US", "viewability": "NO_PAGES"},
+    }
+
+
+async def simulate_upstream():
+    delay = max(0.0, rng.gauss(LATENCY_MS, JITTER_MS)) / 1000
+    await asyncio.sleep(delay)
+    if ERROR_RATE and rng.random() < ERROR_RATE:
+        raise HTTPException(status_code=503, detail="Backend Error")
+
+
+@app.get("/volumes")
+async def search_volumes(
+    q: str = Query(...),
+    maxResults: int = Query(10, le=40),
+    startIndex: int = Query(0),
+):
+    await simulate_upstream()
+    offset = zlib.crc32(q.encode()) + startIndex
+    return {
+        "kind": "books#volumes",
+        "totalItems": CATALOG_SIZE,
+        "items": [make_volume(volume_id(offset + i)) for i in range(maxResults)],
+    }
+
+
+@app.get("/volumes/{book_id}")
+async def get_volume(book_id: str):
+    await simulate_upstream()
+    if not book_id.startswith("vol-"):
+        raise HTTPException(status_code=404, detail="The volume ID could not be found.")
+    return make_volume(book_id)
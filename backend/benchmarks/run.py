@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+SEARCH_TERMS = [
+    "python", "history", "tolkien", "science fiction", "cooking", "poetry",
+    "databases", "mystery", "biology", "philosophy", "jazz", "economics",
+]
+DEFAULT_MIX = "search=50,detail=25,loan=10,wishlist=15"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(module: str, port: int, env: Dict[str, str], workers: int = 1) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", module,
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers),
+            "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+    )
+
+
+async def wait_until_up(url: str, is_up=lambda response: response.status_code < 500, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if is_up(await client.get(url)):
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        weights[name.strip()] = int(weight)
+    return weights
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, uid: str, rng: random.Random, catalog_size: int):
+        self.client = client
+        self.rng = rng
+        self.catalog_size = catalog_size
+        self.headers = {"Authorization": f"Bearer {uid}"}
+
+    def pick_book(self) -> str:
+        # Pareto-skewed popularity so a few titles get most of the traffic.
+        n = int(self.rng.paretovariate(1.2)) % self.catalog_size
+        return f"vol-{n:05d}"
+
+    async def search(self):
+        params = {
+            "query": self.rng.choice(SEARCH_TERMS),
+            "maxResults": 20,
+            "startIndex": self.rng.choice([0, 0, 0, 20, 40]),
+        }
+        return [await self.client.get("/api/books/search", params=params)]
+
+    async def detail(self):
+        return [await self.client.get(f"/api/books/{self.pick_book()}")]
+
+    async def loan(self):
+        book_id = self.pick_book()
+        borrow = await self.client.post("/api/loans", json={"book_id": book_id}, headers=self.headers)
+        responses = [borrow]
+        if borrow.status_code == 200:
+            loan_id = borrow.json()["id"]
+            responses.append(
+                await self.client.put(f"/api/loans/{loan_id}/return", headers=self.headers)
+            )
+        responses.append(await self.client.get("/api/loans", headers=self.headers))
+        return responses
+
+    async def wishlist(self):
+        book_id = self.pick_book()
+        return [
+            await self.client.post("/api/wishlist", json={"book_id": book_id}, headers=self.headers),
+            await self.client.get(f"/api/wishlist/check/{book_id}", headers=self.headers),
+            await self.client.get("/api/wishlist", headers=self.headers),
+            await self.client.delete(f"/api/wishlist/{book_id}", headers=self.headers),
+        ]
+
+
+async def drive_load(base_url: str, args) -> Dict[str, dict]:
+    mix = parse_mix(args.mix)
+    operations, weights = list(mix), list(mix.values())
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def worker(index: int, deadline: float, record: bool):
+            rng = random.Random(args.seed * 1000 + index)
+            user = VirtualUser(client, f"bench-user-{index % args.users}", rng, args.catalog_size)
+            while time.monotonic() < deadline:
+                operation = rng.choices(operations, weights)[0]
+                start = time.perf_counter()
+                try:
+                    responses = await getattr(user, operation)()
+                    failed = any(r.status_code >= 500 for r in responses)
+                except httpx.HTTPError:
+                    failed = True
+                if record:
+                    latencies[operation].append(time.perf_counter() - start)
+                    if failed:
+                        errors[operation] += 1
+
+        for duration, record in ((args.warmup, False), (args.duration, True)):
+            deadline = time.monotonic() + duration
+            await asyncio.gather(*(worker(i, deadline, record) for i in range(args.concurrency)))
+
+    results = {}
+    all_latencies = []
+    for operation, values in sorted(latencies.items()):
+        all_latencies.extend(values)
+        results[operation] = summarize(values, errors[operation], args.duration)
+    results["all"] = summarize(all_latencies, sum(errors.values()), args.duration)
+    return results
+
+
+def summarize(values: List[float], error_count: int, duration: float) -> dict:
+    return {
+        "count": len(values),
+        "errors": error_count,
+        "throughput_rps": len(values) / duration,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
+
+
+def print_report(results: Dict[str, dict], baseline: Dict[str, dict] = None, tolerance: float = 0.1) -> bool:
+    regressed = False
+    print(f"{'operation':<10} {'count':>7} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for operation, stats in results.items():
+        line = (
+            f"{operation:<10} {stats['count']:>7} {stats['errors']:>6} {stats['throughput_rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+        )
+        previous = (baseline or {}).get(operation)
+        if previous:
+            notes = []
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if previous[key] and stats[key] > previous[key] * (1 + tolerance):
+                    notes.append(f"{key} +{(stats[key] / previous[key] - 1) * 100:.0f}%")
+            if previous["throughput_rps"] and stats["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+                notes.append(f"rps -{(1 - stats['throughput_rps'] / previous['throughput_rps']) * 100:.0f}%")
+            if notes:
+                regressed = True
+                line += "  REGRESSION: " + ", ".join(notes)
+        print(line)
+    return regressed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the Library API")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50, help="Distinct authenticated users")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Defaults to a fresh SQLite file")
+    parser.add_argument("--catalog-size", type=int, default=5000)
+    parser.add_argument("--google-latency-ms", type=float, default=80.0)
+    parser.add_argument("--google-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--google-error-rate", type=float, default=0.0)
+    parser.add_argument("--save-baseline", metavar="NAME", help="Store results in baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against baselines/NAME.json")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="library-bench-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    google_port, api_port = free_port(), free_port()
+
+    google = start_server("benchmarks.fake_google_books:app", google_port, {
+        "FAKE_GOOGLE_CATALOG_SIZE": str(args.catalog_size),
+        "FAKE_GOOGLE_LATENCY_MS": str(args.google_latency_ms),
+        "FAKE_GOOGLE_JITTER_MS": str(args.google_jitter_ms),
+        "FAKE_GOOGLE_ERROR_RATE": str(args.google_error_rate),
+        "FAKE_GOOGLE_SEED": str(args.seed),
+    })
+    api = start_server("benchmarks.serve:app", api_port, {
+        "DATABASE_URL": database_url,
+        "GOOGLE_BOOKS_API_URL": f"http://127.0.0.1:{google_port}",
+        "GOOGLE_BOOKS_API_KEY": "",
+        # The load generator is a single client by design.
+        "RATE_LIMIT_ENABLED": "false",
+    }, workers=args.workers)
+    try:
+        await wait_until_up(f"http://127.0.0.1:{google_port}/docs")
+        # Firebase is stubbed, so only the database has to be ready.
+        await wait_until_up(
+            f"http://127.0.0.1:{api_port}/ready",
+            lambda response: response.json()["components"].get("database") == "ok",
+        )
+        results = await drive_load(f"http://127.0.0.1:{api_port}", args)
+    finally:
+        for process in (api, google):
+            process.terminate()
+            process.wait()
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)["results"]
+    regressed = print_report(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save_baseline}.json"), "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
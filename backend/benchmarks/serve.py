@@ -0,0 +1,15 @@
+from fastapi import Security
+from fastapi.security import HTTPAuthorizationCredentials
+from app.firebase_auth import security, verify_firebase_token
+from app.main import app
+
+
+# The bearer token is taken as the uid, so each virtual user authenticates
+# as itself without a Firebase project.
+async def verify_benchmark_token(
+    credentials: HTTPAuthorizationCredentials = Security(security)
+) -> dict:
+    return {"uid": credentials.credentials}
+
+
+app.dependency_overrides[verify_firebase_token] = verify_benchmark_token
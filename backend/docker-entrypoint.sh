@@ -0,0 +1,12 @@
+#!/bin/sh
+set -e
+
+# Metrics from all workers are merged through this directory; it is
+# emptied on start so series from a previous container do not linger.
+# This runs as the entrypoint so a compose `command:` still goes through it.
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+exec "$@"
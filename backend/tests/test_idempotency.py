@@ -0,0 +1,74 @@
+import asyncio
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/idempotency.db"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["CACHE_MEMORY_MAX_ENTRIES"] = "100"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from fastapi import Security
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.database import create_tables
+from app.firebase_auth import security, verify_firebase_token
+from app.main import app
+from app.services.cache import search_cache
+
+
+async def verify_test_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
+    return {"uid": credentials.credentials}
+
+
+app.dependency_overrides[verify_firebase_token] = verify_test_token
+create_tables()
+client = TestClient(app)
+
+
+def borrow(book_id: str, key: str):
+    return client.post(
+        "/api/loans",
+        json={"book_id": book_id},
+        headers={"Authorization": "Bearer reader", "Idempotency-Key": key},
+    )
+
+
+def fill_cache():
+    async def fill():
+        for i in range(settings.CACHE_MEMORY_MAX_ENTRIES * 3):
+            await search_cache.set(f"filler-{i}", {"items": [], "totalItems": 0})
+
+    asyncio.run(fill())
+
+
+def test_retry_is_replayed_after_cache_churn():
+    first = borrow("book-1", "k1")
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+
+    fill_cache()
+
+    retry = borrow("book-1", "k1")
+    assert retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+
+
+def test_key_reused_with_other_body_is_rejected():
+    assert borrow("book-2", "k2").status_code == 200
+    fill_cache()
+    assert borrow("book-3", "k2").status_code == 422
+
+
+def test_stored_client_error_is_replayed():
+    assert borrow("book-4", "k3").status_code == 200
+    duplicate = borrow("book-4", "k4")
+    assert duplicate.status_code == 400
+
+    fill_cache()
+
+    retry = borrow("book-4", "k4")
+    assert retry.status_code == 400
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == duplicate.json()
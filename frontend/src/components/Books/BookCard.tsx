@@ -11,6 +11,7 @@ import {
 import { Favorite, FavoriteBorder } from '@mui/icons-material';
 import { Book } from '@/types/book';
 import { formatBookDescription } from '@/utils/htmlFormatter';
+import apiService from '@/services/api';
 
 interface BookCardProps {
   book: Book;
@@ -59,7 +60,7 @@ const BookCard: React.FC<BookCardProps> = ({
         <CardMedia
           component="img"
           height="280"
-          image={book.coverImage || 'https://via.placeholder.com/200x280?text=No+Cover'}
+          image={apiService.getCoverUrl(book, 256) || 'https://via.placeholder.com/200x280?text=No+Cover'}
           alt={book.title}
           onError={(e) => {
             console.log('Image failed to load:', book.coverImage);
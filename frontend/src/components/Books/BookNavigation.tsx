@@ -11,6 +11,7 @@ import {
   ArrowForward,
 } from '@mui/icons-material';
 import { Book } from '@/types/book';
+import apiService from '@/services/api';
 
 interface BookNavigationProps {
   previousBook?: Book | null;
@@ -97,7 +98,7 @@ const BookNavigation: React.FC<BookNavigationProps> = ({
             </Box>
             <Box
               component="img"
-              src={previousBook.coverImage || 'https://via.placeholder.com/60x80?text=No+Cover'}
+              src={apiService.getCoverUrl(previousBook, 128) || 'https://via.placeholder.com/60x80?text=No+Cover'}
               alt={previousBook.title}
               sx={{
                 width: 60,
@@ -152,7 +153,7 @@ const BookNavigation: React.FC<BookNavigationProps> = ({
             </Box>
             <Box
               component="img"
-              src={nextBook.coverImage || 'https://via.placeholder.com/60x80?text=No+Cover'}
+              src={apiService.getCoverUrl(nextBook, 128) || 'https://via.placeholder.com/60x80?text=No+Cover'}
               alt={nextBook.title}
               sx={{
                 width: 60,
@@ -231,7 +231,7 @@ const BookDetails: React.FC = () => {
           <Grid item xs={12} md={4}>
             <Box
               component="img"
-              src={book.coverImage || 'https://via.placeholder.com/400x600?text=No+Cover'}
+              src={apiService.getCoverUrl(book, 512) || 'https://via.placeholder.com/400x600?text=No+Cover'}
               alt={book.title}
               onError={(e) => {
                 console.log('Image failed to load:', book.coverImage);
@@ -116,6 +116,13 @@ class ApiService {
     const response = await this.api.put(`/api/admin/loans/${loanId}/return`);
     return response.data;
   }
+
+  getCoverUrl(book: { id: string; coverImage?: string }, width: number): string | undefined {
+    if (!book.coverImage) {
+      return undefined;
+    }
+    return `${API_BASE_URL}/api/books/${encodeURIComponent(book.id)}/cover?w=${width}`;
+  }
 }
 
 export default new ApiService();